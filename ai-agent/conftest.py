@@ -0,0 +1 @@
+# Makes main.py importable from tests/ under pytest
@@ -6,24 +6,28 @@ Provides enhanced natural language understanding for ad queue management
 """
 
 import asyncio
+import itertools
 import json
 import logging
 import os
+import re
 import time
 from datetime import datetime
 from typing import Dict, List, Optional, Union
 from contextlib import asynccontextmanager
 
-import httpx
+import aiohttp
+import orjson
 import redis.asyncio as redis
 import structlog
 import uvicorn
+import xxhash
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import ORJSONResponse, Response
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from pydantic import BaseModel, Field
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 
 # Configure logging
 structlog.configure(
@@ -58,6 +62,7 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
     DEFAULT_PROVIDER = os.getenv("AI_PROVIDER", "google")
+    PROMPT_STYLE = os.getenv("PROMPT_STYLE", "compact")  # compact | verbose
     
     # Redis configuration
     REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -71,6 +76,7 @@ class Config:
     
     # Performance configuration
     MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "100"))
+    MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
     CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
     RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "100"))
 
@@ -86,6 +92,7 @@ METRICS = {
     'active_requests': None,
     'ai_provider_errors': None,
 }
+METRICS_ENABLED = any(metric is not None for metric in METRICS.values())
 
 # Helper function to safely use metrics
 def safe_metric_call(metric_name, method_name='inc', *args, **kwargs):
@@ -99,6 +106,19 @@ def safe_metric_call(metric_name, method_name='inc', *args, **kwargs):
             pass  # Ignore metric errors
     return None
 
+def dumps_context(context: Dict, option: int = 0) -> bytes:
+    """Encode a request context with orjson, falling back to stdlib json
+    for values orjson rejects, such as integers wider than 64 bits"""
+    try:
+        return orjson.dumps(context, option=option)
+    except orjson.JSONEncodeError:
+        return json.dumps(
+            context,
+            sort_keys=bool(option & orjson.OPT_SORT_KEYS),
+            indent=2 if option & orjson.OPT_INDENT_2 else None,
+            default=str
+        ).encode()
+
 # Pydantic models
 class CommandRequest(BaseModel):
     command: str = Field(..., min_length=1, max_length=1000, description="Natural language command")
@@ -125,6 +145,9 @@ class HealthResponse(BaseModel):
     cache_status: str
 
 # AI Provider interfaces
+class RetryableUpstreamError(Exception):
+    """Transient upstream failure (5xx or 429) worth retrying"""
+
 class AIProvider:
     """Base class for AI providers"""
     
@@ -133,132 +156,182 @@ class AIProvider:
     
     async def health_check(self) -> bool:
         raise NotImplementedError
+    
+    async def warm_up(self) -> None:
+        """Open upstream connections ahead of the first request (optional)"""
+        return None
 
 class GoogleAIProvider(AIProvider):
     """Google AI (Gemini) provider"""
     
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.endpoint = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent"
-        
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def parse_command(self, command: str, context: Optional[Dict] = None) -> Dict:
-        prompt = self._build_prompt(command, context)
-        
-        payload = {
-            "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": 0.1,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 1024,
-            }
-        }
-        
-        async with httpx.AsyncClient(timeout=config.API_TIMEOUT) as client:
-            response = await client.post(
-                f"{self.endpoint}?key={self.api_key}",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-            
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Google AI API error: {response.status_code}")
-            
-        result = response.json()
-        
-        if 'candidates' not in result or not result['candidates']:
-            raise HTTPException(status_code=500, detail="No response from Google AI")
-            
-        content = result['candidates'][0]['content']['parts'][0]['text']
-        return json.loads(content)
-    
-    def _build_prompt(self, command: str, context: Optional[Dict] = None) -> str:
-        context_str = ""
-        if context:
-            context_str = f"\nContext: {json.dumps(context, indent=2)}\n"
-        
-        return f"""You are an AI assistant that parses natural language commands for an ad processing queue system.
+    # Static parts of the prompt, built once at import instead of per call
+    PROMPT_PREFIX = """You are an AI assistant that parses natural language commands for an ad processing queue system.
 
 Parse the following command and return a JSON response with the command details:
 
-Command: "{command}"{context_str}
+Command: \""""
+    
+    PROMPT_SUFFIX = """
 
 Supported command types and their formats:
 
 1. Queue Modification Commands:
-   - "Change priority to {{X}} for all ads in the {{gameFamily}} family"
-   - "Set priority to {{X}} for ads older than {{Y}} minutes"
-   - "Boost priority for ads waiting longer than {{X}} minutes"
-   - "Remove ads from {{gameFamily}} family from queue"
+   - "Change priority to {X} for all ads in the {gameFamily} family"
+   - "Set priority to {X} for ads older than {Y} minutes"
+   - "Boost priority for ads waiting longer than {X} minutes"
+   - "Remove ads from {gameFamily} family from queue"
    
 2. System Configuration Commands:
    - "Enable starvation mode"
    - "Disable starvation mode"
-   - "Set maximum wait time to {{X}} seconds"
-   - "Set worker count to {{X}}"
+   - "Set maximum wait time to {X} seconds"
+   - "Set worker count to {X}"
    - "Pause queue processing"
    - "Resume queue processing"
    
 3. Status and Analytics Commands:
-   - "Show the next {{X}} ads to be processed"
-   - "List all ads waiting longer than {{X}} minutes"
+   - "Show the next {X} ads to be processed"
+   - "List all ads waiting longer than {X} minutes"
    - "What's the current queue distribution by priority?"
    - "Show queue performance summary"
    - "Get processing statistics"
-   - "Show ads by game family {{gameFamily}}"
+   - "Show ads by game family {gameFamily}"
    
 4. Advanced Commands:
-   - "Create performance report for last {{X}} hours"
+   - "Create performance report for last {X} hours"
    - "Export queue data to CSV"
-   - "Predict processing time for priority {{X}}"
+   - "Predict processing time for priority {X}"
    - "Optimize queue for maximum throughput"
 
 Return ONLY a JSON object in this format:
-{{
+{
   "intent": "specific_action_name",
   "command_type": "queue_modification|system_configuration|status_query|analytics|advanced",
-  "parameters": {{
+  "parameters": {
     "parameter_name": "parameter_value"
-  }},
+  },
   "confidence": 0.95,
   "valid": true,
   "error": null,
   "reasoning": "Brief explanation of the parsing"
-}}
+}
 
 If the command cannot be parsed, return:
-{{
+{
   "intent": "unknown",
   "command_type": "unknown", 
-  "parameters": {{}},
+  "parameters": {},
   "confidence": 0.0,
   "valid": false,
   "error": "Detailed error description",
   "reasoning": "Why the command couldn't be parsed"
-}}
+}
 
 Priority values must be between 1-5. Validate all numeric parameters. Provide confidence score (0.0-1.0)."""
-
+    
+    # Terse schema of the same command set, roughly a third of the input tokens
+    COMPACT_PROMPT_PREFIX = """Parse an ad queue command. Spec:
+{"types":{"queue_modification":["change_priority_by_game_family(priority,gameFamily)","change_priority_by_age(priority,minutes)","boost_priority_by_wait_time(minutes)","remove_by_game_family(gameFamily)"],"system_configuration":["enable_starvation_mode","disable_starvation_mode","set_max_wait_time(seconds)","set_worker_count(count)","pause_queue","resume_queue"],"status_query":["show_next_ads(count)","waiting_ads(minutes)","show_ads_by_game_family(gameFamily)"],"analytics":["queue_distribution","show_performance_summary","get_processing_statistics"],"advanced":["create_performance_report(hours)","export_queue_csv","predict_processing_time(priority)","optimize_throughput"]},"priority":"1-5","confidence":"0.0-1.0"}
+Return only JSON with intent,command_type,parameters,confidence,valid,error. If unparseable: intent and command_type "unknown", valid false, error set.
+Command: \""""
+    
+    COMPACT_PROMPT_SUFFIX = ""
+    
+    def __init__(self, api_key: str, session: aiohttp.ClientSession):
+        self.api_key = api_key
+        self.session = session
+        self.endpoint = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent"
+        if config.PROMPT_STYLE == "verbose":
+            self.prompt_prefix, self.prompt_suffix = self.PROMPT_PREFIX, self.PROMPT_SUFFIX
+        else:
+            self.prompt_prefix, self.prompt_suffix = self.COMPACT_PROMPT_PREFIX, self.COMPACT_PROMPT_SUFFIX
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential_jitter(initial=0.2, max=4),
+        retry=retry_if_exception_type((aiohttp.ClientConnectionError, asyncio.TimeoutError, RetryableUpstreamError)),
+        reraise=True
+    )
+    async def parse_command(self, command: str, context: Optional[Dict] = None) -> Dict:
+        prompt = self._build_prompt(command, context)
+        
+        payload = {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "temperature": 0.1,
+                "topK": 40,
+                "topP": 0.95,
+                "maxOutputTokens": 1024,
+                "responseMimeType": "application/json",
+            }
+        }
+        
+        # Hold a concurrency permit only for the request itself, not retry backoff
+        async with ai_call_semaphore:
+            async with self.session.post(f"{self.endpoint}?key={self.api_key}", data=orjson.dumps(payload)) as response:
+                if response.status == 429 or response.status >= 500:
+                    raise RetryableUpstreamError(f"Google AI API error: {response.status}")
+                if response.status != 200:
+                    raise HTTPException(status_code=500, detail=f"Google AI API error: {response.status}")
+                
+                result = orjson.loads(await response.read())
+        
+        if 'candidates' not in result or not result['candidates']:
+            raise HTTPException(status_code=500, detail="No response from Google AI")
+            
+        # JSON response mode returns the text part as bare JSON, no markdown fencing
+        content = result['candidates'][0]['content']['parts'][0]['text']
+        return orjson.loads(content)
+    
+    def _build_prompt(self, command: str, context: Optional[Dict] = None) -> str:
+        context_str = ""
+        if context:
+            context_str = "\nContext: " + dumps_context(context, orjson.OPT_INDENT_2).decode() + "\n"
+        
+        return "".join((self.prompt_prefix, command, '"', context_str, self.prompt_suffix))
+
+    async def warm_up(self) -> None:
+        # Resolve DNS and complete the TLS handshake into the connection pool
+        async with self.session.get(
+            f"{self.endpoint.split('/v1beta')[0]}/",
+            timeout=aiohttp.ClientTimeout(total=2)
+        ) as response:
+            await response.read()
+    
     async def health_check(self) -> bool:
         try:
-            async with httpx.AsyncClient(timeout=5) as client:
-                response = await client.get(f"{self.endpoint.split('/v1beta')[0]}")
-                return response.status_code < 500
+            async with self.session.get(
+                f"{self.endpoint.split('/v1beta')[0]}",
+                timeout=aiohttp.ClientTimeout(total=5)
+            ) as response:
+                return response.status < 500
         except:
             return False
 
 # Global variables
 app_start_time = time.time()
 redis_client: Optional[redis.Redis] = None
+http_session: Optional[aiohttp.ClientSession] = None
 ai_providers: Dict[str, AIProvider] = {}
 active_requests = 0
+command_counter = itertools.count()
+# Caps concurrent upstream AI requests; providers acquire it per HTTP call
+ai_call_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+# Cache writes are queued off the request path and flushed in pipelined batches
+CACHE_WRITE_BATCH_SIZE = 64
+cache_write_queue: asyncio.Queue = asyncio.Queue(maxsize=10000)
+cache_writer_task: Optional[asyncio.Task] = None
+# In-flight AI calls keyed by cache key, shared by identical concurrent commands
+inflight_commands: Dict[str, asyncio.Future] = {}
+# Last dependency health results as (checked_at, provider_status, cache_status)
+HEALTH_CACHE_TTL = 5.0
+health_cache: Optional[tuple] = None
 
 # Lifespan management
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global redis_client, ai_providers
+    global redis_client, http_session, ai_providers, cache_writer_task
     
     logger.info("Starting AI Agent Service", version=config.SERVICE_VERSION)
     
@@ -273,13 +346,26 @@ async def lifespan(app: FastAPI):
         )
         await redis_client.ping()
         logger.info("Redis connection established")
+        cache_writer_task = asyncio.create_task(cache_writer())
     except Exception as e:
         logger.error("Failed to connect to Redis", error=str(e))
         redis_client = None
     
+    # Shared HTTP session so provider calls reuse pooled keep-alive connections
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=config.MAX_CONCURRENT_REQUESTS,
+            limit_per_host=64,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        ),
+        timeout=aiohttp.ClientTimeout(total=config.API_TIMEOUT),
+        headers={"Content-Type": "application/json"}
+    )
+    
     # Initialize AI providers
     if config.GOOGLE_API_KEY:
-        ai_providers["google"] = GoogleAIProvider(config.GOOGLE_API_KEY)
+        ai_providers["google"] = GoogleAIProvider(config.GOOGLE_API_KEY, http_session)
         logger.info("Google AI provider initialized")
     
     # Add other providers here (OpenAI, Anthropic, etc.)
@@ -287,11 +373,26 @@ async def lifespan(app: FastAPI):
     if not ai_providers:
         logger.warning("No AI providers configured")
     
+    # Prime provider connections so the first request doesn't pay for DNS and TLS
+    warm_up_results = await asyncio.gather(
+        *[provider.warm_up() for provider in ai_providers.values()],
+        return_exceptions=True
+    )
+    for name, warm_up_result in zip(ai_providers.keys(), warm_up_results):
+        if isinstance(warm_up_result, Exception):
+            logger.warning("AI provider warm-up failed", provider=name, error=str(warm_up_result))
+    
     logger.info("AI Agent Service started successfully")
     
     yield
     
     # Shutdown
+    if http_session:
+        await http_session.close()
+    if cache_writer_task and not cache_writer_task.done():
+        # The writer flushes everything queued ahead of the sentinel, then exits
+        await cache_write_queue.put(None)
+        await cache_writer_task
     if redis_client:
         await redis_client.close()
     logger.info("AI Agent Service shutdown complete")
@@ -301,6 +402,7 @@ app = FastAPI(
     title="AI Agent Service",
     description="Advanced AI command processing service for ad queue management",
     version=config.SERVICE_VERSION,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -314,10 +416,24 @@ app.add_middleware(
 )
 
 # Middleware for metrics and logging
+# Probe and scrape endpoints, excluded from request metrics
+UNMETERED_PATHS = frozenset(("/", "/health", "/metrics"))
+
 @app.middleware("http")
 async def metrics_middleware(request: Request, call_next):
     global active_requests
     
+    if request.url.path in UNMETERED_PATHS:
+        return await call_next(request)
+    
+    # Skip the metric bookkeeping entirely while metrics are disabled
+    if not METRICS_ENABLED:
+        active_requests += 1
+        try:
+            return await call_next(request)
+        finally:
+            active_requests -= 1
+    
     start_time = time.time()
     active_requests += 1
     safe_metric_call('active_requests', 'set', active_requests)
@@ -354,7 +470,7 @@ async def get_from_cache(key: str) -> Optional[Dict]:
         cached = await redis_client.get(key)
         if cached:
             safe_metric_call('cache_hits', 'inc')
-            return json.loads(cached)
+            return orjson.loads(cached)
         else:
             safe_metric_call('cache_misses', 'inc')
             return None
@@ -370,31 +486,253 @@ async def set_in_cache(key: str, value: Dict, ttl: int = None) -> bool:
         await redis_client.setex(
             key, 
             ttl or config.CACHE_TTL, 
-            json.dumps(value)
+            orjson.dumps(value)
         )
         return True
     except Exception as e:
         logger.error("Cache set error", key=key, error=str(e))
         return False
 
+async def mget_cache(keys: List[str]) -> List[Optional[Dict]]:
+    """Fetch several cache entries in a single Redis round-trip"""
+    if not redis_client or not keys:
+        return [None] * len(keys)
+    
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(key)
+            cached_values = await pipe.execute()
+    except Exception as e:
+        logger.error("Cache pipeline get error", keys=len(keys), error=str(e))
+        return [None] * len(keys)
+    
+    results = []
+    for key, cached in zip(keys, cached_values):
+        if not cached:
+            safe_metric_call('cache_misses', 'inc')
+            results.append(None)
+            continue
+        
+        # A corrupt entry is treated as a miss instead of failing the batch
+        try:
+            results.append(orjson.loads(cached))
+            safe_metric_call('cache_hits', 'inc')
+        except Exception as e:
+            logger.error("Cache get error", key=key, error=str(e))
+            results.append(None)
+    return results
+
+async def mset_cache(items: Dict[str, Dict], ttl: int = None) -> bool:
+    """Store several cache entries in a single Redis round-trip"""
+    if not redis_client or not items:
+        return False
+    
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.setex(key, ttl or config.CACHE_TTL, orjson.dumps(value))
+            await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error("Cache pipeline set error", keys=len(items), error=str(e))
+        return False
+
+def enqueue_cache_write(key: str, value: Dict) -> None:
+    """Queue a cache entry for the background writer without waiting on Redis"""
+    if not redis_client:
+        return
+    
+    try:
+        cache_write_queue.put_nowait((key, value))
+    except asyncio.QueueFull:
+        logger.warning("Cache write queue full, dropping entry", key=key)
+
+async def cache_writer() -> None:
+    """Drain queued cache writes into pipelined Redis batches until a None sentinel"""
+    while True:
+        item = await cache_write_queue.get()
+        items = {}
+        while item is not None:
+            key, value = item
+            items[key] = value
+            if len(items) >= CACHE_WRITE_BATCH_SIZE or cache_write_queue.empty():
+                break
+            item = cache_write_queue.get_nowait()
+        await mset_cache(items)
+        if item is None:
+            return
+
+# Fast-path parsing for the documented command templates, no AI call needed
+FAST_PATH_COMMANDS = [
+    (r"change priority to (?P<priority>[1-5]) for all ads in the (?P<gameFamily>[\w-]+) family",
+     "change_priority_by_game_family", "queue_modification"),
+    (r"set priority to (?P<priority>[1-5]) for ads older than (?P<minutes>[1-9]\d*) minutes?",
+     "change_priority_by_age", "queue_modification"),
+    (r"boost priority for ads waiting longer than (?P<minutes>[1-9]\d*) minutes?",
+     "boost_priority_by_wait_time", "queue_modification"),
+    (r"remove ads from (?P<gameFamily>[\w-]+) family from queue",
+     "remove_by_game_family", "queue_modification"),
+    (r"enable starvation mode", "enable_starvation_mode", "system_configuration"),
+    (r"disable starvation mode", "disable_starvation_mode", "system_configuration"),
+    (r"set maximum wait time to (?P<seconds>[1-9]\d*) seconds?", "set_max_wait_time", "system_configuration"),
+    (r"set worker count to (?P<count>[1-9]\d*)", "set_worker_count", "system_configuration"),
+    (r"pause queue processing", "pause_queue", "system_configuration"),
+    (r"resume queue processing", "resume_queue", "system_configuration"),
+    (r"show the next (?P<count>[1-9]\d*) ads to be processed", "show_next_ads", "status_query"),
+    (r"list all ads waiting longer than (?P<minutes>[1-9]\d*) minutes?", "waiting_ads", "status_query"),
+    (r"what(?:'s| is) the current queue distribution by priority", "queue_distribution", "analytics"),
+    (r"show ads by game family (?P<gameFamily>[\w-]+)", "show_ads_by_game_family", "status_query"),
+    (r"show queue performance summary", "show_performance_summary", "analytics"),
+    (r"get processing statistics", "get_processing_statistics", "analytics"),
+    (r"create performance report for last (?P<hours>[1-9]\d*) hours?", "create_performance_report", "advanced"),
+    (r"export queue data to csv", "export_queue_csv", "advanced"),
+    (r"predict processing time for priority (?P<priority>[1-5])", "predict_processing_time", "advanced"),
+    (r"optimize queue for maximum throughput", "optimize_throughput", "advanced"),
+]
+
+# Numeric parameters and their largest plausible value; anything beyond is
+# left to the AI provider to validate instead of being accepted outright
+FAST_PATH_NUMERIC_LIMITS = {
+    "priority": 5,
+    "minutes": 7 * 24 * 60,
+    "seconds": 24 * 60 * 60,
+    "count": 1000,
+    "hours": 7 * 24,
+}
+
+# Patterns indexed by their leading word, so a command is only tried against
+# the handful of templates that can match instead of the whole table
+def build_fast_path_index(commands: List) -> Dict[str, List]:
+    index: Dict[str, List] = {}
+    for pattern, intent, command_type in commands:
+        index.setdefault(re.match(r"[a-z]+", pattern).group(), []).append(
+            (re.compile(rf"\s*{pattern}\s*[.!?]?\s*", re.IGNORECASE), intent, command_type)
+        )
+    return index
+
+FAST_PATH_PATTERNS = build_fast_path_index(FAST_PATH_COMMANDS)
+
+LEADING_WORD_PATTERN = re.compile(r"\s*([A-Za-z]+)")
+
+def fast_path_parse(command: str) -> Optional[Dict]:
+    """Parse a command that exactly matches a known template, or return None"""
+    leading_word = LEADING_WORD_PATTERN.match(command)
+    if not leading_word:
+        return None
+    
+    for pattern, intent, command_type in FAST_PATH_PATTERNS.get(leading_word.group(1).lower(), ()):
+        match = pattern.fullmatch(command)
+        if match:
+            parameters = {}
+            for name, value in match.groupdict().items():
+                if name in FAST_PATH_NUMERIC_LIMITS:
+                    value = int(value)
+                    if value > FAST_PATH_NUMERIC_LIMITS[name]:
+                        return None
+                parameters[name] = value
+            return {
+                'intent': intent,
+                'command_type': command_type,
+                'parameters': parameters,
+                'confidence': 1.0,
+                'valid': True
+            }
+    return None
+
 # Command processing
-async def process_command(request: CommandRequest) -> CommandResponse:
-    """Process a command using AI providers with fallback"""
-    command_id = f"cmd_{int(time.time() * 1000)}_{hash(request.command) % 1000000}"
-    start_time = time.time()
+def build_cache_key(request: CommandRequest) -> str:
+    """Build a cache key that is stable across worker processes and restarts"""
+    cache_key = f"command:{xxhash.xxh3_64_hexdigest(request.command.encode())}"
+    if request.context:
+        context_bytes = dumps_context(request.context, orjson.OPT_SORT_KEYS)
+        cache_key += f":{xxhash.xxh3_64_hexdigest(context_bytes)}"
+    return cache_key
+
+def new_command_id(start_ns: int) -> str:
+    return f"cmd_{start_ns:x}_{next(command_counter):x}"
+
+def elapsed_ms(start_ns: int) -> int:
+    return (time.perf_counter_ns() - start_ns) // 1_000_000
+
+def cached_response(cached_result: Dict, command_id: str, start_ns: int) -> CommandResponse:
+    logger.info("Command served from cache", command_id=command_id)
+    cached_result['command_id'] = command_id
+    cached_result['processing_time_ms'] = elapsed_ms(start_ns)
+    # Entries are only cached after CommandResponse validation succeeded. This
+    # mostly saves work in batch_parse; /api/v1/parse revalidates via response_model.
+    return CommandResponse.model_construct(**cached_result)
+
+def fast_path_response(fast_result: Dict, command_id: str, start_ns: int) -> CommandResponse:
+    logger.info("Command served from fast path", command_id=command_id, intent=fast_result['intent'])
+    return CommandResponse(
+        command_id=command_id,
+        status='completed',
+        intent=fast_result['intent'],
+        command_type=fast_result['command_type'],
+        parameters=fast_result['parameters'],
+        confidence=fast_result['confidence'],
+        processing_time_ms=elapsed_ms(start_ns),
+        provider='fast_path'
+    )
+
+async def process_command(request: CommandRequest, use_cache: bool = True) -> CommandResponse:
+    """Process a command using AI providers with fallback
+    
+    With use_cache=False the cache is neither read nor written; callers such
+    as batch_parse do both themselves, reading in one pipelined round-trip.
+    """
+    start_ns = time.perf_counter_ns()
+    command_id = new_command_id(start_ns)
+    
+    # Known templates are parsed locally without touching the cache or AI providers
+    fast_result = fast_path_parse(request.command)
+    if fast_result:
+        return fast_path_response(fast_result, command_id, start_ns)
     
     # Check cache first
-    cache_key = f"command:{hash(request.command)}"
-    if request.context:
-        cache_key += f":{hash(str(request.context))}"
+    cache_key = build_cache_key(request)
+    
+    if use_cache:
+        cached_result = await get_from_cache(cache_key)
+        if cached_result:
+            return cached_response(cached_result, command_id, start_ns)
     
-    cached_result = await get_from_cache(cache_key)
-    if cached_result:
-        logger.info("Command served from cache", command_id=command_id)
-        cached_result['command_id'] = command_id
-        cached_result['processing_time_ms'] = int((time.time() - start_time) * 1000)
-        return CommandResponse(**cached_result)
+    # Join an identical command that is already being parsed. If that call is
+    # cancelled (e.g. its client disconnected), retry and take over as leader.
+    while (inflight := inflight_commands.get(cache_key)) is not None:
+        try:
+            shared = await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if inflight.cancelled():
+                continue
+            raise
+        logger.info("Command joined in-flight request", command_id=command_id, leader_id=shared.command_id)
+        return shared.model_copy(update={
+            'command_id': command_id,
+            'processing_time_ms': elapsed_ms(start_ns)
+        })
     
+    future = asyncio.get_running_loop().create_future()
+    inflight_commands[cache_key] = future
+    try:
+        response = await call_ai_providers(request, command_id, start_ns, cache_key, use_cache)
+        future.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved in case nobody joined this call
+        future.exception()
+        raise
+    finally:
+        inflight_commands.pop(cache_key, None)
+
+async def call_ai_providers(request: CommandRequest, command_id: str, start_ns: int,
+                            cache_key: str, use_cache: bool) -> CommandResponse:
+    """Parse a command with each configured AI provider until one succeeds"""
     # Try AI providers in order of preference
     providers_to_try = [config.DEFAULT_PROVIDER] + [p for p in ai_providers.keys() if p != config.DEFAULT_PROVIDER]
     
@@ -404,14 +742,14 @@ async def process_command(request: CommandRequest) -> CommandResponse:
             continue
             
         provider = ai_providers[provider_name]
-        ai_start_time = time.time()
+        ai_start_ns = time.perf_counter_ns()
         
         try:
             logger.info("Processing command", command_id=command_id, provider=provider_name, command=request.command[:100])
             
             result = await provider.parse_command(request.command, request.context)
             
-            ai_duration = time.time() - ai_start_time
+            ai_duration = (time.perf_counter_ns() - ai_start_ns) / 1e9
             # Record AI processing duration
             metric = METRICS.get('ai_processing_duration')
             if metric is not None:
@@ -432,19 +770,23 @@ async def process_command(request: CommandRequest) -> CommandResponse:
                 'command_type': result.get('command_type', 'unknown'),
                 'parameters': result.get('parameters', {}),
                 'confidence': result.get('confidence', 0.0),
-                'processing_time_ms': int((time.time() - start_time) * 1000),
+                'processing_time_ms': elapsed_ms(start_ns),
                 'provider': provider_name
             }
             
-            # Cache successful result
-            await set_in_cache(cache_key, response_data)
+            # Validate before caching so only well-formed responses are ever stored
+            response = CommandResponse(**response_data)
+            
+            # Cache the validated, coerced values rather than the raw provider output
+            if use_cache:
+                enqueue_cache_write(cache_key, response.model_dump())
             
             logger.info("Command processed successfully", 
                        command_id=command_id, 
                        provider=provider_name,
                        confidence=result.get('confidence', 0.0))
             
-            return CommandResponse(**response_data)
+            return response
             
         except Exception as e:
             last_error = str(e)
@@ -471,13 +813,13 @@ async def process_command(request: CommandRequest) -> CommandResponse:
         command_type='unknown',
         parameters={},
         confidence=0.0,
-        processing_time_ms=int((time.time() - start_time) * 1000),
+        processing_time_ms=elapsed_ms(start_ns),
         provider='none',
         result={'error': f'All AI providers failed. Last error: {last_error}'}
     )
 
 # API Endpoints
-@app.get("/", response_model=Dict)
+@app.get("/", response_model=Dict, include_in_schema=False)
 async def root():
     """Root endpoint with service information"""
     return {
@@ -493,27 +835,36 @@ async def root():
         }
     }
 
-@app.get("/health", response_model=HealthResponse)
+@app.get("/health", response_model=HealthResponse, include_in_schema=False)
 async def health():
     """Health check endpoint"""
-    # Check AI providers
-    provider_status = {}
-    for name, provider in ai_providers.items():
-        try:
-            is_healthy = await provider.health_check()
-            provider_status[name] = "healthy" if is_healthy else "unhealthy"
-        except:
-            provider_status[name] = "error"
+    global health_cache
     
-    # Check cache
-    cache_status = "healthy"
-    if redis_client:
-        try:
-            await redis_client.ping()
-        except:
-            cache_status = "unhealthy"
+    if health_cache and time.monotonic() - health_cache[0] < HEALTH_CACHE_TTL:
+        _, provider_status, cache_status = health_cache
     else:
-        cache_status = "disabled"
+        # Check AI providers and cache concurrently
+        results = await asyncio.gather(
+            *[provider.health_check() for provider in ai_providers.values()],
+            redis_client.ping() if redis_client else asyncio.sleep(0, result=True),
+            return_exceptions=True
+        )
+        
+        provider_status = {}
+        for name, is_healthy in zip(ai_providers.keys(), results):
+            if isinstance(is_healthy, BaseException):
+                provider_status[name] = "error"
+            else:
+                provider_status[name] = "healthy" if is_healthy else "unhealthy"
+        
+        if not redis_client:
+            cache_status = "disabled"
+        elif isinstance(results[-1], BaseException):
+            cache_status = "unhealthy"
+        else:
+            cache_status = "healthy"
+        
+        health_cache = (time.monotonic(), provider_status, cache_status)
     
     return HealthResponse(
         status="healthy",
@@ -531,16 +882,44 @@ async def parse_command_endpoint(request: CommandRequest):
 @app.post("/api/v1/batch")
 async def batch_parse(requests: List[CommandRequest]):
     """Parse multiple commands in batch"""
-    if len(requests) > 10:
-        raise HTTPException(status_code=400, detail="Maximum 10 commands per batch")
+    if len(requests) > config.MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Maximum {config.MAX_BATCH_SIZE} commands per batch")
+    
+    start_ns = time.perf_counter_ns()
+    
+    results = [None] * len(requests)
+    
+    # Known templates are answered locally and never touch the cache
+    lookup_indexes = []
+    for i, req in enumerate(requests):
+        fast_result = fast_path_parse(req.command)
+        if fast_result:
+            results[i] = fast_path_response(fast_result, new_command_id(start_ns), start_ns)
+        else:
+            lookup_indexes.append(i)
+    
+    # Look up the rest in one pipelined round-trip and only dispatch misses
+    cache_keys = {i: build_cache_key(requests[i]) for i in lookup_indexes}
+    cached_results = await mget_cache(list(cache_keys.values()))
+    
+    miss_indexes = []
+    for i, cached_result in zip(lookup_indexes, cached_results):
+        if cached_result:
+            results[i] = cached_response(cached_result, new_command_id(start_ns), start_ns)
+        else:
+            miss_indexes.append(i)
+    
+    miss_set = set(miss_indexes)
+    tasks = [process_command(requests[i], use_cache=False) for i in miss_indexes]
+    miss_results = await asyncio.gather(*tasks, return_exceptions=True)
     
-    tasks = [process_command(req) for req in requests]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for i, result in zip(miss_indexes, miss_results):
+        results[i] = result
     
-    # Convert exceptions to error responses
+    # Dump each response once and convert exceptions to error responses
     processed_results = []
     for i, result in enumerate(results):
-        if isinstance(result, Exception):
+        if isinstance(result, BaseException):
             processed_results.append({
                 'command_id': f'batch_error_{i}',
                 'status': 'error',
@@ -553,11 +932,16 @@ async def batch_parse(requests: List[CommandRequest]):
                 'result': {'error': str(result)}
             })
         else:
-            processed_results.append(result.dict())
+            result_data = result.model_dump()
+            processed_results.append(result_data)
+            # Successful misses are written back by the background cache writer
+            if i in miss_set and result.status == 'completed':
+                enqueue_cache_write(cache_keys[i], result_data)
     
-    return {'results': processed_results, 'total': len(requests)}
+    # Plain dicts go straight to orjson, skipping FastAPI's jsonable_encoder pass
+    return ORJSONResponse({'results': processed_results, 'total': len(requests)})
 
-@app.get("/metrics")
+@app.get("/metrics", include_in_schema=False)
 async def metrics():
     """Prometheus metrics endpoint"""
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -576,7 +960,7 @@ async def stats():
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error("HTTP exception", path=request.url.path, status_code=exc.status_code, detail=exc.detail)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail, "status_code": exc.status_code}
     )
@@ -584,7 +968,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error("Unhandled exception", path=request.url.path, error=str(exc), type=type(exc).__name__)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error", "status_code": 500}
     )
@@ -595,6 +979,8 @@ if __name__ == "__main__":
         host=config.HOST,
         port=config.PORT,
         reload=False,
+        loop="uvloop",
+        http="httptools",
         log_config={
             "version": 1,
             "disable_existing_loggers": False,
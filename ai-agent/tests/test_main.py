@@ -0,0 +1,50 @@
+import orjson
+
+import main
+
+
+def test_dumps_context_falls_back_for_oversized_int():
+    encoded = main.dumps_context({"n": 2**70}, orjson.OPT_INDENT_2)
+    assert str(2**70).encode() in encoded
+
+
+def test_build_prompt_accepts_oversized_int_context():
+    provider = main.GoogleAIProvider("test-key", session=None)
+    prompt = provider._build_prompt("Show queue performance summary", {"n": 2**70})
+    assert str(2**70) in prompt
+
+
+def test_build_cache_key_accepts_oversized_int_context():
+    request = main.CommandRequest(command="Show queue performance summary", context={"n": 2**70})
+    key = main.build_cache_key(request)
+    assert key.startswith("command:")
+    assert key == main.build_cache_key(request)
+    assert key != main.build_cache_key(main.CommandRequest(command=request.command, context={"n": 2**70 + 1}))
+
+
+def test_fast_path_uses_command_parser_vocabulary():
+    result = main.fast_path_parse("Set priority to 2 for ads older than 1 minute")
+    assert result["intent"] == "change_priority_by_age"
+    assert result["parameters"] == {"priority": 2, "minutes": 1}
+
+    result = main.fast_path_parse("List all ads waiting longer than 10 minutes")
+    assert result["intent"] == "waiting_ads"
+
+    result = main.fast_path_parse("What's the current queue distribution by priority?")
+    assert (result["intent"], result["command_type"]) == ("queue_distribution", "analytics")
+
+
+def test_fast_path_defers_out_of_range_numbers():
+    assert main.fast_path_parse("Set worker count to 0") is None
+    assert main.fast_path_parse("Set worker count to 999999999") is None
+    assert main.fast_path_parse("Set worker count to 8")["parameters"] == {"count": 8}
+
+
+def test_fast_path_keeps_game_family_as_string():
+    result = main.fast_path_parse("Show ads by game family 42")
+    assert result["parameters"] == {"gameFamily": "42"}
+
+
+def test_fast_path_rejects_compound_commands():
+    command = "Change priority to 3 for all ads in the RPG family and set worker count to 5 for all ads in the X family"
+    assert main.fast_path_parse(command) is None